@@ -1,9 +1,17 @@
-from flask import Flask, render_template, request, send_file, jsonify
+from flask import Flask, render_template, request, send_file, Response
 import os
+import orjson
+import gzip
+import hashlib
+import selectors
 import sqlite3
 import subprocess
 import time
 import threading
+import atexit
+import queue
+from collections import defaultdict, OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 app = Flask(__name__)
 
@@ -15,39 +23,220 @@ DB_PATH = '/tmp/scores.db' if IS_VERCEL else 'scores.db'
 ENGINES_FOLDER = 'engines'
 
 # Ensure directories exist
-if not os.path.exists(DOWNLOAD_FOLDER):
-    os.makedirs(DOWNLOAD_FOLDER)
-if not os.path.exists(ENGINES_FOLDER):
-    os.makedirs(ENGINES_FOLDER)
+os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+os.makedirs(ENGINES_FOLDER, exist_ok=True)
+
+def json_response(data, status=200):
+    """Serializes data with orjson into a JSON response."""
+    return Response(orjson.dumps(data), status=status, mimetype='application/json')
 
 # Database Setup
+# SQL shared by the score writer and leaderboard endpoints
+INSERT_SCORE_SQL = 'INSERT INTO scores (game, player, score) VALUES (?, ?, ?)'
+LEADERBOARD_SQL = 'SELECT player, score, date FROM scores WHERE game = ? ORDER BY score DESC LIMIT 10'
+LEADERBOARD_ALL_SQL = '''SELECT game, player, score, date FROM
+                          (SELECT game, player, score, date,
+                                  ROW_NUMBER() OVER (PARTITION BY game ORDER BY score DESC) AS rn
+                           FROM scores)
+                          WHERE rn <= 5 ORDER BY game, rn'''
+
+_tls = threading.local()
+
+def get_conn():
+    """Returns this thread's SQLite connection, opening it on first use."""
+    conn = getattr(_tls, 'conn', None)
+    if conn is None:
+        # Autocommit mode: each statement commits on its own
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA cache_size=-65536') # 64 MB page cache
+        conn.execute('PRAGMA temp_store=MEMORY')
+        _tls.conn = conn
+    return conn
+
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute('''CREATE TABLE IF NOT EXISTS scores 
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                         game TEXT, 
-                         player TEXT, 
-                         score INTEGER, 
-                         date TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn = get_conn()
+    conn.execute('''CREATE TABLE IF NOT EXISTS scores 
+                    (id INTEGER PRIMARY KEY, 
+                     game TEXT, 
+                     player TEXT, 
+                     score INTEGER, 
+                     date TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    # Covering index: leaderboard queries are answered without touching the table
+    had_index = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_scores_leaderboard'").fetchone()
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scores_leaderboard ON scores(game, score DESC, player, date)')
+    # Only for databases built before the covering index, when (game, score) was indexed alone
+    conn.execute('DROP INDEX IF EXISTS idx_scores_game_score')
+    # ANALYZE scans the whole table, so run it once rather than on every import
+    has_stats = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if not had_index or not has_stats:
+        conn.execute('ANALYZE')
 
 init_db()
 
+# Leaderboard cache: ('game', name) or ('all',) -> (timestamp, pre-serialized JSON), cleared on new scores.
+# Keys come from the URL, so the cache is LRU-bounded and expired entries are dropped.
+LEADERBOARD_TTL = 30
+LEADERBOARD_CACHE_SIZE = 64
+_lb_cache = OrderedDict()
+_lb_generation = 0 # Bumped on every invalidation
+_lb_lock = threading.Lock()
+
+def get_cached_leaderboard(key):
+    """Returns (payload or None, generation) for key."""
+    with _lb_lock:
+        entry = _lb_cache.get(key)
+        if entry:
+            if time.time() - entry[0] < LEADERBOARD_TTL:
+                _lb_cache.move_to_end(key)
+                return entry[1], _lb_generation
+            del _lb_cache[key]
+        return None, _lb_generation
+
+def cache_leaderboard(key, data, generation):
+    payload = orjson.dumps(data)
+    with _lb_lock:
+        # A score was saved while we queried, so this result may already be stale
+        if generation == _lb_generation:
+            _lb_cache[key] = (time.time(), payload)
+            _lb_cache.move_to_end(key)
+            while len(_lb_cache) > LEADERBOARD_CACHE_SIZE:
+                _lb_cache.popitem(last=False)
+    return payload
+
+def invalidate_leaderboard(game):
+    global _lb_generation
+    with _lb_lock:
+        _lb_generation += 1
+        _lb_cache.pop(('game', game), None)
+        _lb_cache.pop(('all',), None)
+
+# Score writer: inserts are queued and committed in batches by a background thread.
+# A queued score shows up on the leaderboard only after its batch commits (~50 ms), and
+# scores still queued when the process is killed without running atexit are lost.
+# Serverless platforms may freeze the process once the response is sent, so on Vercel
+# scores are committed synchronously instead.
+SCORE_BATCH_SIZE = 100
+SCORE_BATCH_WAIT = 0.05 # Seconds to wait for more scores before committing
+SCORE_MIN, SCORE_MAX = -2**63, 2**63 - 1 # SQLite INTEGER range
+MAX_NAME_LENGTH = 64
+_score_queue = queue.Queue()
+_score_writer = None
+_score_writer_lock = threading.Lock()
+
+def insert_scores(conn, rows):
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(INSERT_SCORE_SQL, rows)
+
+def write_scores(pending):
+    """Inserts (game, player, score) rows, batched in one transaction when possible."""
+    conn = get_conn()
+    try:
+        insert_scores(conn, pending)
+    except Exception as e:
+        # Retry row by row so one bad score doesn't drop the rest of the batch
+        print(f"Error saving score batch, retrying individually: {e}")
+        for row in pending:
+            try:
+                insert_scores(conn, [row])
+            except Exception as e:
+                print(f"Error saving score {row}: {e}")
+    for game in {row[0] for row in pending}:
+        invalidate_leaderboard(game)
+
+def score_writer_loop():
+    running = True
+    while running:
+        pending = [_score_queue.get()]
+        while len(pending) < SCORE_BATCH_SIZE:
+            try:
+                pending.append(_score_queue.get(timeout=SCORE_BATCH_WAIT))
+            except queue.Empty:
+                break
+        if None in pending: # Shutdown sentinel from flush_scores
+            running = False
+            pending = [row for row in pending if row is not None]
+        try:
+            if pending:
+                write_scores(pending)
+        except Exception as e: # Keep the writer alive no matter what
+            print(f"Error saving scores: {e}")
+
+def queue_score(game, player, score):
+    global _score_writer
+    with _score_writer_lock:
+        if _score_writer is None:
+            _score_writer = threading.Thread(target=score_writer_loop, name='score-writer', daemon=True)
+            _score_writer.start()
+    _score_queue.put((game, player, score))
+
+@atexit.register
+def flush_scores():
+    """Lets the writer commit any queued scores before the server exits."""
+    if _score_writer is not None:
+        _score_queue.put(None)
+        _score_writer.join(timeout=5)
+
 # --- Chess Engine Management ---
+# engine name -> {'proc': Popen, 'skill': last Skill Level sent, 'last_poll': time, 'alive': bool,
+#                 'queue': pending searches for the engine's worker thread}
 active_engines = {}
+_engines_lock = threading.Lock()
+_engine_start_locks = {} # engine name -> lock held while that engine starts
+ENGINE_THREADS = os.cpu_count() or 1
+ENGINE_HASH_MB = 128
+ENGINE_POLL_INTERVAL = 0.5 # Seconds between liveness checks per engine
+ENGINE_QUEUE_TIMEOUT = 30 # Seconds a move request waits, including queueing behind other moves
+ENGINE_STOP_TIMEOUT = 2 # Seconds to wait for 'bestmove' after sending 'stop'
 
 def get_engine_process(engine_name):
     """Starts or retrieves an active engine process."""
+    with _engines_lock:
+        entry = _get_live_engine(engine_name)
+    if entry:
+        return entry
+
+    engine_path = refresh_engines()['paths'].get(engine_name)
+    if engine_path is None:
+        return None
+    # Reject names that resolve outside the engines folder (e.g. via symlinks)
+    if not engine_path.startswith(os.path.realpath(ENGINES_FOLDER) + os.sep):
+        return None
+
+    # Startup can take seconds, so only requests for this engine wait on it
+    with _engines_lock:
+        start_lock = _engine_start_locks.setdefault(engine_name, threading.Lock())
+    with start_lock:
+        with _engines_lock:
+            entry = _get_live_engine(engine_name)
+        if entry:
+            return entry
+        entry = start_engine(engine_name, engine_path)
+        if entry:
+            with _engines_lock:
+                active_engines[engine_name] = entry
+        return entry
+
+def _get_live_engine(engine_name):
+    """Returns the running entry for engine_name, dropping it if the process died."""
     if engine_name in active_engines:
-        proc = active_engines[engine_name]
-        if proc.poll() is None:
-            return proc
+        entry = active_engines[engine_name]
+        now = time.time()
+        if entry['alive'] and now - entry['last_poll'] < ENGINE_POLL_INTERVAL:
+            return entry
+        entry['last_poll'] = now
+        entry['alive'] = entry['proc'].poll() is None
+        if entry['alive']:
+            return entry
         else:
+            entry['queue'].put(None) # Stop its worker thread
             del active_engines[engine_name]
-    
-    engine_path = os.path.join(ENGINES_FOLDER, engine_name)
-    if not os.path.exists(engine_path):
-        return None
+    return None
 
+def start_engine(engine_name, engine_path):
+    """Launches an engine, completes the UCI handshake and starts its worker."""
     try:
         # Start process with pipes
         proc = subprocess.Popen(
@@ -55,52 +244,202 @@ def get_engine_process(engine_name):
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            universal_newlines=True,
-            bufsize=1
+            bufsize=0,
+            close_fds=True,
+            start_new_session=True
         )
-        active_engines[engine_name] = proc
-        return proc
+        # Windows can't select() on pipes, so a reader thread feeds a queue instead
+        sel = None
+        chunks = None
+        if os.name != 'nt':
+            sel = selectors.DefaultSelector()
+            sel.register(proc.stdout, selectors.EVENT_READ)
+        else:
+            chunks = queue.Queue()
+            threading.Thread(target=pipe_reader_loop, args=(proc.stdout, chunks),
+                             name=f'engine-reader-{engine_name}', daemon=True).start()
+        entry = {'proc': proc, 'skill': None, 'sel': sel, 'chunks': chunks, 'buf': bytearray(),
+                 'last_poll': time.time(), 'alive': True, 'queue': queue.Queue()}
+
+        # UCI handshake and one-time options; later moves skip straight to 'position'
+        send_command(proc, "uci")
+        if read_until(entry, "uciok", timeout=10) is None:
+            proc.kill()
+            if sel is not None:
+                sel.close()
+            return None
+        send_command(proc, f"setoption name Threads value {ENGINE_THREADS}")
+        send_command(proc, f"setoption name Hash value {ENGINE_HASH_MB}")
+
+        # Only this thread talks to the engine from here on
+        threading.Thread(target=engine_worker_loop, args=(entry,),
+                         name=f'engine-{engine_name}', daemon=True).start()
+        return entry
     except Exception as e:
         print(f"Error starting engine {engine_name}: {e}")
         return None
 
+def pipe_reader_loop(pipe, chunks):
+    """Copies engine output into a queue until the pipe closes."""
+    fd = pipe.fileno()
+    while True:
+        try:
+            chunk = os.read(fd, 65536)
+        except OSError:
+            chunk = b''
+        chunks.put(chunk)
+        if not chunk:
+            break
+
+@atexit.register
+def shutdown_engines():
+    """Terminates all engine processes when the server exits."""
+    with _engines_lock:
+        for entry in active_engines.values():
+            entry['queue'].put(None)
+            if entry['proc'].poll() is None:
+                entry['proc'].terminate()
+        active_engines.clear()
+
+def engine_worker_loop(engine):
+    """Runs queued searches for one engine, one at a time."""
+    while True:
+        job = engine['queue'].get()
+        if job is None:
+            break
+        fen, skill_level, limits, future = job
+        if not future.set_running_or_notify_cancel():
+            continue
+        try:
+            future.set_result(run_search(engine, fen, skill_level, limits))
+        except Exception as e:
+            future.set_exception(e)
+    if engine['sel'] is not None:
+        engine['sel'].close()
+
+def run_search(engine, fen, skill_level, limits, timeout=10):
+    """Sends a position to the engine and returns its best move."""
+    proc = engine['proc']
+    if is_new_game(fen):
+        send_command(proc, "ucinewgame")
+    if engine['skill'] != skill_level:
+        send_command(proc, f"setoption name Skill Level value {skill_level}")
+        engine['skill'] = skill_level
+    send_command(proc, "isready") # Ensure options are applied
+    send_command(proc, f"position fen {fen}")
+    send_command(proc, f"go {limits}")
+    best_move = read_best_move(engine, timeout)
+    if best_move is None:
+        resync_engine(engine)
+    return best_move
+
+def resync_engine(engine):
+    """Stops an overrunning search so its bestmove is not read by the next request."""
+    send_command(engine['proc'], "stop")
+    if read_until(engine, "bestmove", timeout=ENGINE_STOP_TIMEOUT) is None:
+        # Unresponsive: kill it so the next request starts a fresh engine
+        engine['proc'].kill()
+        engine['proc'].wait()
+        engine['alive'] = False
+
 def send_command(proc, command):
     """Sends a UCI command to the engine."""
     if proc.poll() is None:
         try:
-            proc.stdin.write(command + "\n")
+            proc.stdin.write((command + "\n").encode('ascii'))
             proc.stdin.flush()
         except IOError:
             pass
 
-def read_best_move(proc, timeout=5):
+def read_until(engine, prefix, timeout=5):
+    """Reads output until a line starting with prefix is found."""
+    prefix = prefix.encode('ascii')
+    fd = engine['proc'].stdout.fileno()
+    buf = engine['buf']
+    deadline = time.time() + timeout
+    while True:
+        # Jump straight to a line starting with prefix, skipping 'info' output
+        if buf.startswith(prefix):
+            start = 0
+        else:
+            start = buf.find(b'\n' + prefix)
+            if start >= 0:
+                start += 1
+        if start >= 0:
+            end = buf.find(b'\n', start)
+            if end >= 0:
+                line = buf[start:end].strip()
+                del buf[:end + 1]
+                return line.decode('ascii', 'replace')
+        else:
+            # Drop complete lines but keep a partial one that may still match
+            del buf[:buf.rfind(b'\n') + 1]
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        if engine['sel'] is not None:
+            if not engine['sel'].select(remaining):
+                return None
+            chunk = os.read(fd, 65536)
+        else:
+            try:
+                chunk = engine['chunks'].get(timeout=remaining)
+            except queue.Empty:
+                return None
+        if not chunk: # Engine closed its output
+            return None
+        buf += chunk
+
+def read_best_move(engine, timeout=5):
     """Reads output until 'bestmove' is found."""
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        line = proc.stdout.readline().strip()
-        if line.startswith("bestmove"):
-            return line.split()[1]
+    line = read_until(engine, "bestmove", timeout)
+    if line:
+        return line.split()[1]
     return None
 
+def is_new_game(fen):
+    """True if the FEN is from the first move of a game (fullmove number 1)."""
+    parts = fen.split()
+    return len(parts) >= 6 and parts[5] == '1'
+
+# Engine listing, rebuilt only when the engines folder's mtime changes
+_engines_cache = {'mtime': -1, 'payload': b'[]', 'paths': {}}
+
+def refresh_engines():
+    """Rescans the engines folder if it changed and returns the cache."""
+    mtime = os.stat(ENGINES_FOLDER).st_mtime_ns
+    if _engines_cache['mtime'] != mtime:
+        with os.scandir(ENGINES_FOLDER) as entries:
+            files = [e.name for e in entries if e.is_file() and (e.name.endswith('.exe') or '.' not in e.name)]
+        _engines_cache['paths'] = {f: os.path.realpath(os.path.join(ENGINES_FOLDER, f)) for f in files}
+        _engines_cache['payload'] = orjson.dumps(files)
+        _engines_cache['mtime'] = mtime
+    return _engines_cache
+
 @app.route('/api/chess/engines')
 def list_engines():
     """Lists available engine executables."""
-    files = [f for f in os.listdir(ENGINES_FOLDER) if f.endswith('.exe') or '.' not in f]
-    return jsonify(files)
+    return Response(refresh_engines()['payload'], mimetype='application/json')
 
 @app.route('/api/chess/move', methods=['POST'])
 def chess_move():
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return json_response({"error": "Invalid JSON body"}, 400)
     fen = data.get('fen')
     engine_name = data.get('engine')
     difficulty = data.get('difficulty', 1) # 1=Easy, 2=Med, 3=Hard
 
-    if not engine_name:
-        return jsonify({"error": "No engine selected"}), 400
+    if not isinstance(engine_name, str) or not engine_name:
+        return json_response({"error": "No engine selected"}, 400)
+    # The FEN is sent to the engine verbatim, so it must be a single ASCII line
+    if not isinstance(fen, str) or not fen.strip() or not fen.isascii() or '\n' in fen or '\r' in fen:
+        return json_response({"error": "Invalid FEN"}, 400)
 
-    proc = get_engine_process(engine_name)
-    if not proc:
-        return jsonify({"error": "Engine failed to start"}), 500
+    engine = get_engine_process(engine_name)
+    if not engine:
+        return json_response({"error": "Engine failed to start"}, 500)
 
     # Map difficulty to UCI options and limits
     # Stockfish 'Skill Level' ranges from 0 (weakest) to 20 (strongest)
@@ -118,108 +457,153 @@ def chess_move():
         limits = "movetime 1000"
     
     try:
-        send_command(proc, "uci")
-        send_command(proc, f"setoption name Skill Level value {skill_level}")
-        send_command(proc, "isready") # Ensure options are applied
-        send_command(proc, f"position fen {fen}")
-        send_command(proc, f"go {limits}")
-        
-        best_move = read_best_move(proc, timeout=10)
+        future = Future()
+        engine['queue'].put((fen, skill_level, limits, future))
+        best_move = future.result(timeout=ENGINE_QUEUE_TIMEOUT)
         
         if best_move:
-            return jsonify({"move": best_move})
+            return json_response({"move": best_move})
         else:
-            return jsonify({"error": "Engine timed out"}), 500
+            return json_response({"error": "Engine timed out"}, 500)
             
+    except FutureTimeoutError:
+        future.cancel()
+        return json_response({"error": "Engine timed out"}, 500)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
 
 # --- Routes ---
+# Game pages have no template context, so render them once and serve the bytes
+STATIC_PAGES = ('hub.html', 'snake.html', 'pong.html', 'tetris.html', 'chess.html', 'guess.html',
+                'checkers.html', 'hockey.html', 'tic-tac-toe.html', 'connect-four.html', 'leaderboard.html')
+_static_pages = {} # name -> (etag, html, gzipped html)
+
+def build_static_pages():
+    with app.app_context():
+        for name in STATIC_PAGES:
+            html = render_template(name).encode('utf-8')
+            etag = hashlib.sha1(html).hexdigest()
+            _static_pages[name] = (etag, html, gzip.compress(html))
+
+build_static_pages()
+
+def serve_page(name):
+    """Serves a pre-rendered page, gzipped when the client accepts it."""
+    etag, body, gzipped = _static_pages[name]
+    use_gzip = request.accept_encodings.quality('gzip') > 0
+    if use_gzip:
+        etag += '-gz'
+        body = gzipped
+
+    headers = {'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, headers=headers, mimetype='text/html')
+
 @app.route('/')
 def hub():
-    return render_template('hub.html')
+    return serve_page('hub.html')
 
 @app.route('/game/snake')
 def snake():
-    return render_template('snake.html')
+    return serve_page('snake.html')
 
 @app.route('/game/pong')
 def pong():
-    return render_template('pong.html')
+    return serve_page('pong.html')
 
 @app.route('/game/tetris')
 def tetris():
-    return render_template('tetris.html')
+    return serve_page('tetris.html')
 
 @app.route('/game/chess')
 def chess():
-    return render_template('chess.html')
+    return serve_page('chess.html')
 
 @app.route('/game/guess')
 def guess():
-    return render_template('guess.html')
+    return serve_page('guess.html')
 
 @app.route('/game/checkers')
 def checkers():
-    return render_template('checkers.html')
+    return serve_page('checkers.html')
 
 @app.route('/game/hockey')
 def hockey():
     # Render static version if on Vercel to avoid potential issues
-    return render_template('hockey.html')
+    return serve_page('hockey.html')
 
 @app.route('/game/tic-tac-toe')
 def tic_tac_toe():
-    return render_template('tic-tac-toe.html')
+    return serve_page('tic-tac-toe.html')
 
 @app.route('/game/connect-four')
 def connect_four():
-    return render_template('connect-four.html')
-
-# Vercel needs the 'app' object
-# Ensure directories exist
-if not os.path.exists(DOWNLOAD_FOLDER):
-    os.makedirs(DOWNLOAD_FOLDER)
-if not os.path.exists(ENGINES_FOLDER):
-    os.makedirs(ENGINES_FOLDER)
-
-init_db()
+    return serve_page('connect-four.html')
 
 @app.route('/leaderboard')
 def leaderboard_page():
-    return render_template('leaderboard.html')
+    return serve_page('leaderboard.html')
 
 @app.route('/api/score', methods=['POST'])
 def save_score():
-    data = request.json
+    """Saves a score; responds {"status": "success"} once it is accepted.
+
+    On Vercel the score is committed before responding; elsewhere it is queued
+    and appears on the leaderboard once the writer commits its batch.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return json_response({"error": "Invalid JSON body"}, 400)
     game = data.get('game')
-    player = data.get('player', 'Anonymous')
+    player = data.get('player')
+    if player is None:
+        player = 'Anonymous'
     score = data.get('score')
+
+    # Validate up front: the insert happens later on the writer thread
+    if not isinstance(game, str) or not game or len(game) > MAX_NAME_LENGTH:
+        return json_response({"error": "Invalid game"}, 400)
+    if not isinstance(player, str) or len(player) > MAX_NAME_LENGTH:
+        return json_response({"error": "Invalid player"}, 400)
+    if isinstance(score, bool) or not isinstance(score, int) or not SCORE_MIN <= score <= SCORE_MAX:
+        return json_response({"error": "Invalid score"}, 400)
     
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute('INSERT INTO scores (game, player, score) VALUES (?, ?, ?)', (game, player, score))
-    return jsonify({"status": "success"})
+    if IS_VERCEL:
+        insert_scores(get_conn(), [(game, player, score)])
+        invalidate_leaderboard(game)
+    else:
+        queue_score(game, player, score)
+    return json_response({"status": "success"})
 
 @app.route('/api/leaderboard/<game>')
 def leaderboard(game):
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute('SELECT player, score, date FROM scores WHERE game = ? ORDER BY score DESC LIMIT 10', (game,))
-        scores = [{"player": r[0], "score": r[1], "date": r[2]} for r in cursor.fetchall()]
-    return jsonify(scores)
+    payload, generation = get_cached_leaderboard(('game', game))
+    if payload is not None:
+        return Response(payload, mimetype='application/json')
+
+    conn = get_conn()
+    cursor = conn.execute(LEADERBOARD_SQL, (game,))
+    scores = [{"player": r[0], "score": r[1], "date": r[2]} for r in cursor.fetchall()]
+    return Response(cache_leaderboard(('game', game), scores, generation), mimetype='application/json')
 
 @app.route('/api/leaderboard/all')
 def leaderboard_all():
-    with sqlite3.connect(DB_PATH) as conn:
-        # Get list of all games
-        games_cursor = conn.execute('SELECT DISTINCT game FROM scores')
-        games = [r[0] for r in games_cursor.fetchall()]
-        
-        all_scores = {}
-        for game in games:
-            cursor = conn.execute('SELECT player, score, date FROM scores WHERE game = ? ORDER BY score DESC LIMIT 5', (game,))
-            all_scores[game] = [{"player": r[0], "score": r[1], "date": r[2]} for r in cursor.fetchall()]
-            
-    return jsonify(all_scores)
+    payload, generation = get_cached_leaderboard(('all',))
+    if payload is not None:
+        return Response(payload, mimetype='application/json')
+
+    conn = get_conn()
+    # Top 5 per game in a single query
+    cursor = conn.execute(LEADERBOARD_ALL_SQL)
+
+    all_scores = defaultdict(list)
+    for r in cursor.fetchall():
+        all_scores[r[0]].append({"player": r[1], "score": r[2], "date": r[3]})
+
+    return Response(cache_leaderboard(('all',), all_scores, generation), mimetype='application/json')
 
 
 